@@ -0,0 +1,60 @@
+import argparse
+import base64
+import json
+import threading
+
+import pytest
+
+import xmapi
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self._payload = payload if payload is not None else {}
+        self.content = json.dumps(self._payload).encode()
+
+    def json(self):
+        return self._payload
+
+
+class FakeSession:
+    """Stands in for xmapi._session. Every call is recorded and answered by handler."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.auth = None
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def request(self, verb, url, **kwargs):
+        with self._lock:
+            self.calls.append((verb, url, kwargs))
+        return self.handler(verb, url, kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("post", url, **kwargs)
+
+
+@pytest.fixture
+def fake_session(monkeypatch):
+    session = FakeSession(lambda verb, url, kwargs: FakeResponse())
+    monkeypatch.setattr(xmapi, "_session", session)
+    return session
+
+
+@pytest.fixture
+def api(monkeypatch, fake_session):
+    """An initialized configuration talking to a fake session."""
+    config = argparse.Namespace(url="https://tenant.clients.xmcyber.com", key="secret", fail_on_error=True,
+                                access_token="access", refresh_token="refresh", token_expiry=None)
+    monkeypatch.setattr(xmapi, "_config", config)
+    return fake_session
+
+
+def make_token(exp):
+    """Builds an unsigned JWT carrying only an "exp" claim."""
+    def encode(part):
+        return base64.urlsafe_b64encode(json.dumps(part).encode()).decode().rstrip("=")
+
+    return f"{encode({'alg': 'none'})}.{encode({'exp': exp})}."
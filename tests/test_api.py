@@ -0,0 +1,20 @@
+import xmapi
+
+
+def test_build_path():
+    assert xmapi._build_path("sensors", False) == "/api/sensors"
+    assert xmapi._build_path(["entityInventory", "entityTypes"], False) == "/api/entityInventory/entityTypes"
+
+
+def test_build_path_encoded():
+    assert xmapi._build_path("sensors/a b", True) == "/api/sensors/a%20b"
+    assert xmapi._build_path(["sensors", "a?b"], True) == "/api/sensors/a%3Fb"
+
+
+def test_api_request_url(api):
+    xmapi.api_get("sensors")
+
+    verb, url, _ = api.calls[-1]
+    assert verb == "get"
+    assert url == "https://tenant.clients.xmcyber.com/api/sensors"
+    assert "//api" not in url
@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+
+import pytest
+
+import xmapi
+import xmapi.commandline
+import xmapi.configfile
+from tests.conftest import FakeResponse, make_token
+
+
+@pytest.fixture
+def clean_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(xmapi, "_config", None)
+    monkeypatch.setattr(xmapi, "_parser", xmapi.commandline.get_parser())
+    xmapi.configfile._get_locations.cache_clear()
+    yield
+    xmapi.configfile._get_locations.cache_clear()
+
+
+def test_initialize_authenticates(clean_environment, fake_session, monkeypatch):
+    token = make_token(time.time() + 3600)
+    fake_session.handler = lambda verb, url, kwargs: FakeResponse(200, {"accessToken": token, "refreshToken": "refresh"})
+    monkeypatch.setattr("sys.argv", ["prog", "-s", "tenant", "-k", "secret"])
+
+    xmapi.initialize()
+
+    config = xmapi.get_config()
+    assert fake_session.calls[0][1] == "https://tenant.clients.xmcyber.com/api/auth/"
+    assert fake_session.calls[0][2]["headers"] == {"X-Api-Key": "secret"}
+    assert config.access_token == token
+    assert config.refresh_token == "refresh"
+    assert config.token_expiry == pytest.approx(time.time() + 3600, abs=5)
+    assert fake_session.auth.token == token
+
+
+def test_initialize_without_refresh_token(clean_environment, fake_session, monkeypatch):
+    fake_session.handler = lambda verb, url, kwargs: FakeResponse(200, {"accessToken": "opaque"})
+    monkeypatch.setattr("sys.argv", ["prog", "-s", "tenant", "-k", "secret"])
+
+    xmapi.initialize()
+
+    assert xmapi.get_config().refresh_token is None
+    assert xmapi.get_config().token_expiry is None
+
+
+def test_expiring_token_is_refreshed(api):
+    new_token = make_token(time.time() + 3600)
+    xmapi._set_tokens({"accessToken": make_token(time.time() + 60), "refreshToken": "old"})
+
+    def handler(verb, url, kwargs):
+        if url.endswith("/api/auth/refresh"):
+            return FakeResponse(200, {"accessToken": new_token, "refreshToken": "new"})
+        return FakeResponse(200)
+    api.handler = handler
+
+    xmapi.api_get("sensors")
+
+    assert [url for _, url, _ in api.calls] == ["https://tenant.clients.xmcyber.com/api/auth/refresh",
+                                                "https://tenant.clients.xmcyber.com/api/sensors"]
+    assert api.calls[0][2]["json"] == {"refreshToken": "old"}
+    assert xmapi.get_config().refresh_token == "new"
+    assert api.auth.token == new_token
+
+
+def test_failed_refresh_authenticates_again(api):
+    new_token = make_token(time.time() + 3600)
+    xmapi._set_tokens({"accessToken": make_token(time.time() + 60), "refreshToken": "revoked"})
+
+    def handler(verb, url, kwargs):
+        if url.endswith("/api/auth/refresh"):
+            return FakeResponse(401)
+        if url.endswith("/api/auth/"):
+            return FakeResponse(200, {"accessToken": new_token, "refreshToken": "new"})
+        return FakeResponse(200)
+    api.handler = handler
+
+    xmapi.api_get("sensors")
+
+    assert [url for _, url, _ in api.calls] == ["https://tenant.clients.xmcyber.com/api/auth/refresh",
+                                                "https://tenant.clients.xmcyber.com/api/auth/",
+                                                "https://tenant.clients.xmcyber.com/api/sensors"]
+    assert api.calls[1][2]["headers"] == {"X-Api-Key": "secret"}
+    assert xmapi.get_config().refresh_token == "new"
+    assert api.auth.token == new_token
+
+
+def test_failed_refresh_and_authentication_raises(api):
+    xmapi._set_tokens({"accessToken": make_token(time.time() + 60), "refreshToken": "revoked"})
+    api.handler = lambda verb, url, kwargs: FakeResponse(401)
+
+    with pytest.raises(Exception, match="Failed to authenticate"):
+        xmapi.api_get("sensors")
+
+    assert len(api.calls) == 2
+
+
+def test_valid_token_is_not_refreshed(api):
+    xmapi._set_tokens({"accessToken": make_token(time.time() + 3600), "refreshToken": "refresh"})
+
+    xmapi.api_get("sensors")
+
+    assert [url for _, url, _ in api.calls] == ["https://tenant.clients.xmcyber.com/api/sensors"]
+
+
+def test_waiting_thread_tolerates_undecodable_refreshed_token(api):
+    xmapi._set_tokens({"accessToken": make_token(time.time() + 60), "refreshToken": "refresh"})
+    errors = []
+
+    def ensure_token():
+        try:
+            xmapi._ensure_token(xmapi.get_config())
+        except Exception as e:
+            errors.append(e)
+
+    # Hold the lock as if another thread were refreshing, then finish that
+    # "refresh" with a token whose expiry can't be decoded.
+    with xmapi._token_lock:
+        thread = threading.Thread(target=ensure_token)
+        thread.start()
+        time.sleep(0.1)
+        xmapi._set_tokens({"accessToken": "opaque"})
+
+    thread.join()
+    assert errors == []
+    assert api.calls == []
+
+
+def test_initialize_uses_config_file_arguments_only(clean_environment, fake_session, monkeypatch, tmp_path):
+    (tmp_path / "xmapi.ini").write_text("[DEFAULT]\nsubdomain = tenant\nkey = file\nverbose = false\n"
+                                        "unrelated = value\n\n[other]\nkey = other\nproxy_url = proxy\nproxy_port = 8080\n")
+    fake_session.handler = lambda verb, url, kwargs: FakeResponse(200, {"accessToken": "opaque"})
+    monkeypatch.setattr("sys.argv", ["prog", "-c", "other", "-k", "cli"])
+
+    xmapi.initialize()
+
+    config = xmapi.get_config()
+    assert config.subdomain == "tenant"
+    assert config.key == "cli"
+    assert config.verbose is False
+    assert config.proxy_url == "proxy"
+    assert config.proxy_port == 8080
+    assert not hasattr(config, "unrelated")
+
+
+def test_initialize_takes_log_level_from_config_file(clean_environment, fake_session, monkeypatch, tmp_path):
+    (tmp_path / "xmapi.ini").write_text("[DEFAULT]\nsubdomain = tenant\nkey = file\nverbose = true\n")
+    fake_session.handler = lambda verb, url, kwargs: FakeResponse(200, {"accessToken": "opaque"})
+    monkeypatch.setattr("sys.argv", ["prog"])
+    levels = []
+    monkeypatch.setattr("logging.basicConfig", lambda level: levels.append(level))
+
+    xmapi.initialize()
+
+    assert xmapi.get_config().verbose is True
+    assert levels == [logging.DEBUG]
+
+
+def test_initialize_rejects_malformed_boolean(clean_environment, fake_session, monkeypatch, tmp_path):
+    (tmp_path / "xmapi.ini").write_text("[DEFAULT]\nsubdomain = tenant\nkey = file\n\n[other]\nquiet = maybe\n")
+    monkeypatch.setattr("sys.argv", ["prog", "-c", "other"])
+
+    with pytest.raises(Exception, match=r"'quiet' in section \[other\]"):
+        xmapi.initialize()
@@ -0,0 +1,68 @@
+import os
+import pickle
+
+import pytest
+
+import xmapi.configfile as configfile
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    home = tmp_path / "home"
+    home.mkdir()
+    work = tmp_path / "work"
+    work.mkdir()
+
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.chdir(work)
+    configfile._get_locations.cache_clear()
+    yield work
+    configfile._get_locations.cache_clear()
+
+
+def test_parse_config_writes_private_cache(project):
+    ini = project / "xmapi.ini"
+    ini.write_text("[DEFAULT]\nkey = secret\n")
+
+    config = configfile.parse_config()
+    assert config["DEFAULT"]["key"] == "secret"
+
+    cache_path = configfile._get_cache_path()
+    assert os.path.dirname(cache_path) != str(project)
+    assert os.stat(cache_path).st_mode & 0o777 == 0o600
+    assert not os.path.exists(project / ".xmapi.ini.cache")
+
+
+def test_parse_config_uses_cache_until_file_changes(project):
+    ini = project / "xmapi.ini"
+    ini.write_text("[DEFAULT]\nkey = first\n")
+    configfile.parse_config()
+
+    ini.write_text("[DEFAULT]\nkey = second value\n")
+    assert configfile.parse_config()["DEFAULT"]["key"] == "second value"
+
+
+def test_parse_config_without_files_writes_no_cache(project):
+    assert configfile.parse_config() is None
+    assert not os.path.exists(configfile._get_cache_path())
+
+
+def test_malformed_cache_is_a_miss(project):
+    (project / "xmapi.ini").write_text("[DEFAULT]\nkey = secret\n")
+    cache_path = configfile._get_cache_path()
+    os.makedirs(os.path.dirname(cache_path))
+    with open(cache_path, "wb") as f:
+        pickle.dump(42, f)
+    os.chmod(cache_path, 0o600)
+
+    assert configfile.parse_config()["DEFAULT"]["key"] == "secret"
+
+
+def test_cache_writable_by_others_is_ignored(project):
+    (project / "xmapi.ini").write_text("[DEFAULT]\nkey = secret\n")
+    configfile.parse_config()
+    fingerprint = configfile._get_fingerprint(path for _, path in configfile._get_locations())
+    assert configfile._load_cache(fingerprint) is not None
+
+    os.chmod(configfile._get_cache_path(), 0o666)
+    assert configfile._load_cache(fingerprint) is None
@@ -0,0 +1,107 @@
+import importlib
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+import xmapi
+from tests.conftest import FakeResponse
+
+
+@pytest.fixture
+def facade(monkeypatch):
+    # The entityInventory API wrapper isn't part of this package; facade only needs it to import.
+    entity_inventory = types.ModuleType("xmapi.entityInventory")
+    monkeypatch.setitem(sys.modules, "xmapi.entityInventory", entity_inventory)
+    monkeypatch.setattr(xmapi, "entityInventory", entity_inventory, raising=False)
+    monkeypatch.delitem(sys.modules, "xmapi.facade", raising=False)
+
+    return importlib.import_module("xmapi.facade")
+
+
+def _sensor_pages(pages, paging):
+    def handler(verb, url, kwargs):
+        page = kwargs["params"]["page"]
+        return FakeResponse(200, {"data": pages[page - 1], "paging": paging(page)})
+    return handler
+
+
+def test_get_all_sensors_merges_known_pages(api, facade):
+    pages = [[{"id": n} for n in range(page * 10, page * 10 + 10)] for page in range(5)]
+    api.handler = _sensor_pages(pages, lambda page: {"totalPages": len(pages)})
+
+    sensors = facade.get_all_sensors(searchTerm="host")
+
+    assert sensors == [sensor for page in pages for sensor in page]
+    params = [kwargs["params"] for _, _, kwargs in api.calls]
+    assert sorted(p["page"] for p in params) == [1, 2, 3, 4, 5]
+    assert all(p["pageSize"] == 500 and p["search"] == '{"$regex":"/host/i"}' for p in params)
+
+
+def test_get_all_sensors_fetches_pages_concurrently(api, facade):
+    # Every page after the first has to be in flight at once to get past the barrier
+    barrier = threading.Barrier(4, timeout=5)
+
+    def handler(verb, url, kwargs):
+        if kwargs["params"]["page"] > 1:
+            barrier.wait()
+        return FakeResponse(200, {"data": [kwargs["params"]["page"]], "paging": {"totalPages": 5}})
+    api.handler = handler
+
+    assert facade.get_all_sensors() == [1, 2, 3, 4, 5]
+
+
+def test_get_all_sensors_stops_fetching_after_a_failed_page(api, facade):
+    release = threading.Event()
+
+    def handler(verb, url, kwargs):
+        page = kwargs["params"]["page"]
+        if page == 2:
+            return FakeResponse(500)
+        if page > 2:
+            release.wait(timeout=5)
+        return FakeResponse(200, {"data": [], "paging": {"totalPages": 50}})
+    api.handler = handler
+    xmapi.set_log_on_error()
+
+    start = time.monotonic()
+    assert facade.get_all_sensors() is None
+    assert time.monotonic() - start < 2
+
+    release.set()
+    time.sleep(0.1)
+    assert len(api.calls) < 50
+
+
+def test_get_all_sensors_fails_if_any_page_fails(api, facade):
+    def handler(verb, url, kwargs):
+        if kwargs["params"]["page"] == 2:
+            return FakeResponse(500)
+        return FakeResponse(200, {"data": [], "paging": {"totalPages": 3}})
+    api.handler = handler
+    xmapi.set_log_on_error()
+
+    assert facade.get_all_sensors() is None
+
+
+def test_get_all_sensors_follows_next_link(api, facade):
+    def handler(verb, url, kwargs):
+        if url.endswith("/api/sensors"):
+            return FakeResponse(200, {"data": [1], "paging": {"nextLink": "https://tenant.clients.xmcyber.com/api/sensors?cursor=abc"}})
+        if url.endswith("/api/sensors?cursor=abc"):
+            return FakeResponse(200, {"data": [2], "paging": {"nextLink": "/api/sensors?cursor=def"}})
+        return FakeResponse(200, {"data": [3], "paging": {}})
+    api.handler = handler
+
+    assert facade.get_all_sensors() == [1, 2, 3]
+    assert [url for _, url, _ in api.calls] == ["https://tenant.clients.xmcyber.com/api/sensors",
+                                                "https://tenant.clients.xmcyber.com/api/sensors?cursor=abc",
+                                                "https://tenant.clients.xmcyber.com/api/sensors?cursor=def"]
+    assert api.calls[1][2]["params"] is None
+
+
+def test_get_link_path(facade):
+    assert facade._get_link_path("https://host/api/sensors?page=2&pageSize=500") == "sensors?page=2&pageSize=500"
+    assert facade._get_link_path("/api/sensors") == "sensors"
@@ -15,9 +15,16 @@ import xmapi.commandline
 import xmapi.configfile 
 from xmapi.util import default_on_error
 from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import requests
+import base64
+import functools
+import json
 import logging
 import sys
+import threading
+import time
 
 class _HTTPBearerAuth(requests.auth.AuthBase):
     def __init__(self, token):
@@ -35,7 +42,17 @@ class _HTTPBearerAuth(requests.auth.AuthBase):
 
 __all__=["get_config", "get_commandline_parser", "initialize"]
 
-_config_holder = [ None ]
+_config = None
+
+# Shared session so that keep-alive connections are reused across API calls.
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32,
+                                       max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504],
+                                                         raise_on_status=False)))
+
+# Tokens are refreshed this many seconds before they actually expire
+_TOKEN_REFRESH_BUFFER = 120
+_token_lock = threading.Lock()
 
 _log = logging.getLogger('xmcyber')
 _parser = xmapi.commandline.get_parser()
@@ -57,31 +74,25 @@ def set_fail_on_error():
 
 
 def get_config():
-    if not _config_holder[0]:
+    if _config is None:
         raise Exception("Configuration file not initialized. xmapi.parse_arguments() must be called first.")
     
-    return _config_holder[0]
+    return _config
 
 
 def initialize():
     """Parse the command line and load in any initialization files.
     """
-    global _config_holder
-    if _config_holder[0]:
+    global _config
+    if _config is not None:
         _log.info("xmapi.parse_arguments() called multiple times")
         return
 
     # We're first parsing the command line. This allows us to get startup vars not available
     # in the config file, like log level or config file chunk.
-    _cli_args = _parser.parse_args()
-    _config_holder[0] = _cli_args
+    _cli_args, _ = _parser.parse_known_args()
     chunk = _cli_args.chunk
-    
-    if _cli_args.verbose:
-        logging.basicConfig(level=logging.DEBUG)
-    elif _cli_args.quiet:
-        logging.basicConfig(level=logging.ERROR)
-
+    _configure_logging(_cli_args)
 
     _log.debug(f"Using chunk '{chunk}' in the config file.")
 
@@ -105,20 +116,24 @@ def initialize():
 
     _log.info("Starting configuration initialization")
 
-    # Now we can get the parameters with which to run the program, taking precedence as required.
-    _cli_args.subdomain = _get_item(_raw_config, _cli_args.subdomain, "subdomain", chunk=chunk)
+    # Now we can get the parameters with which to run the program. Config file values become the
+    # parser defaults, so anything given on the command line takes precedence.
+    _parser.set_defaults(**_get_config_defaults(_raw_config, chunk))
+    _cli_args = _parser.parse_args()
+    _config = _cli_args
+
+    # The log level may also come from the config file. If it was already set on the
+    # command line, logging is configured and this does nothing.
+    _configure_logging(_cli_args)
+
     if not _cli_args.subdomain:
         raise Exception("No client subdomain specified")
 
-    _cli_args.key = _get_item(_raw_config, _cli_args.key, "key", chunk=chunk)
     if not _cli_args.key:
         raise Exception("No --key has specified")
     
     _cli_args.url = f"https://{_cli_args.subdomain}.clients.xmcyber.com"
 
-    _cli_args.proxy_port = _get_item(_raw_config, _cli_args.proxy_port, "proxy_port", chunk=chunk)
-    _cli_args.proxy_url = _get_item(_raw_config, _cli_args.proxy_url, "proxy_url", chunk=chunk)
-    
     if _cli_args.proxy_url:
         if not _cli_args.proxy_port:
             raise Exception("Proxy URL was provided without a proxy port number")
@@ -129,42 +144,55 @@ def initialize():
     _authenticate()
     
 
-def _get_item(config_file, value, key, default_value=None, chunk=None):
-    if value:
-        _log.debug(f"Found {key} on the command line. Will take precedence over config file")
-        return value
-    
-    if chunk and chunk in config_file and key in config_file[chunk]:
-        _log.debug(f"Found {key} in a configuration file subdomain section but not on the command line.")
-        return config_file[chunk][key]
-    
-    if key in config_file["DEFAULT"]:
-        _log.debug(f"Found {key} in a configuration file default section but not on the command line.")
-        return config_file["DEFAULT"][key]
-    
-    _log.debug(f"Item {key} not found in configuration file or on the command line.")
-    return default_value
+def _configure_logging(args):
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+    elif args.quiet:
+        logging.basicConfig(level=logging.ERROR)
 
 
-def _build_path(path, encode_path):
-    if type(path) is str:
-        if encode_path:
-            path = path.split("/")
+def _get_config_defaults(raw_config, chunk):
+    # Only keys matching a command line argument are used, so stray ini entries can't
+    # end up as (or shadow) attributes of the configuration.
+    actions = {action.dest: action for action in _parser._actions if action.dest != "help"}
+    defaults = {}
 
-    if encode_path:
-        elements = []
+    for section in ("DEFAULT", chunk):
+        if section not in raw_config:
+            continue
 
-        for element in path:
-            elements.append(quote(element))
+        for key, value in raw_config[section].items():
+            if key not in actions:
+                continue
 
-        path = elements
+            if isinstance(actions[key].default, bool):
+                try:
+                    value = raw_config[section].getboolean(key)
+                except ValueError:
+                    raise Exception(f"Invalid value for '{key}' in section [{section}] of the configuration file; expected true or false")
 
-    if not type(path) is str:
-        path = "/".join(path)
+            defaults[key] = value
 
-    return f"/api/{path}"
+    return defaults
 
 
+def _build_path(path, encode_path):
+    if isinstance(path, str):
+        if not encode_path:
+            return f"/api/{path}"
+
+        path = path.split("/")
+
+    if encode_path:
+        return _build_encoded_path(tuple(path))
+
+    return "/api/" + "/".join(path)
+
+
+@functools.lru_cache(maxsize=256)
+def _build_encoded_path(elements):
+    return "/api/" + "/".join(quote(element) for element in elements)
+
 
 def api_get(path, encode_path=False, data=None, params=None, headers=None, on_error=default_on_error):
     """Wrapper to make a GET call to the API."""
@@ -189,10 +217,10 @@ def api_delete(path, encode_path=False, data=None, params=None, headers=None, on
 def api_request(verb, path, encode_path=False, data=None, params=None, headers=None, on_error=default_on_error):
     """This is the generic entry-point for making HTTP calls to the API"""
     config = get_config()
-    auth = _HTTPBearerAuth(config.access_token)
-    url = f"{config.url}/{_build_path(path, encode_path)}"
+    _ensure_token(config)
+    url = f"{config.url}{_build_path(path, encode_path)}"
 
-    resp = requests.request(verb, url, data=data, params=params, headers=headers, auth=auth)
+    resp = _session.request(verb, url, data=data, params=params, headers=headers)
 
     if resp.status_code < 200 or resp.status_code > 299:
         on_error(resp)
@@ -202,19 +230,59 @@ def api_request(verb, path, encode_path=False, data=None, params=None, headers=N
 
 def _authenticate():
     config = get_config()
+    config.refresh_token = None
+    config.token_expiry = None
 
     headers = {
         "X-Api-Key": config.key
     }
 
-    headers = {
-        "X-Api-Key": config.key
-    }
-
-    r = requests.post(f"{config.url}/api/auth/", headers=headers)
+    r = _session.post(f"{config.url}/api/auth/", headers=headers)
     if r.status_code != 200:
         raise Exception(f"Failed to authenticate (status code {r.status_code})")
 
-    json = r.json()
-    config.access_token = json["accessToken"]
-    config.refresh_token = json["refreshToken"]
+    _set_tokens(r.json())
+
+
+def _ensure_token(config):
+    if not config.token_expiry or time.time() + _TOKEN_REFRESH_BUFFER < config.token_expiry:
+        return
+
+    # API calls may be made from several threads; only one of them should refresh
+    with _token_lock:
+        if not config.token_expiry or time.time() + _TOKEN_REFRESH_BUFFER < config.token_expiry:
+            return
+
+        _log.debug("Access token is about to expire, refreshing")
+        r = _session.post(f"{config.url}/api/auth/refresh", json={"refreshToken": config.refresh_token})
+        if r.status_code != 200:
+            # The refresh token itself may have expired or been revoked; start over with the API key
+            _log.warning(f"Failed to refresh access token (status code {r.status_code}), authenticating again")
+            _authenticate()
+            return
+
+        _set_tokens(r.json())
+
+
+def _set_tokens(tokens):
+    config = get_config()
+    config.access_token = tokens["accessToken"]
+    if "refreshToken" in tokens:
+        config.refresh_token = tokens["refreshToken"]
+    config.token_expiry = _get_token_expiry(config.access_token)
+
+    if isinstance(_session.auth, _HTTPBearerAuth):
+        _session.auth.token = config.access_token
+    else:
+        _session.auth = _HTTPBearerAuth(config.access_token)
+
+
+def _get_token_expiry(token):
+    """Returns the "exp" claim of a JWT, or None if it can't be decoded."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload))["exp"]
+    except (IndexError, KeyError, TypeError, ValueError):
+        _log.debug("Unable to determine the access token expiry; it will not be refreshed proactively")
+        return None
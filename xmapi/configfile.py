@@ -1,8 +1,10 @@
 from collections import OrderedDict
 from enum import Enum
 import configparser
+import functools
 import logging
 import os
+import pickle
 import platform
 
 # Automatically loaded and executed when this module is loaded.
@@ -25,6 +27,11 @@ import platform
 
 _log = logging.getLogger("xmcyber")
 
+# The merged configuration is pickled into the user's own .xmcyber directory,
+# along with a fingerprint of the files it was read from, so that unchanged files
+# don't have to be reparsed. It contains secrets, so it is only readable by the user.
+_cache_name = "xmapi.ini.cache"
+
 class _ConfigScope(Enum):
     USER = 1
     GLOBAL = 2
@@ -34,8 +41,7 @@ def _get_for_darwin(which):
     if which == _ConfigScope.GLOBAL:
         return "/Users/Shared"
     elif which == _ConfigScope.USER:
-        if "HOME" in os.environ:
-            return os.environ["HOME"]
+        return os.environ.get("HOME")
     
     return None
 
@@ -43,22 +49,15 @@ def _get_for_linux(which):
     if which == _ConfigScope.GLOBAL:
         return "/etc"
     elif which == _ConfigScope.USER:
-        if "HOME" in os.environ:
-            return os.environ["HOME"]
-
-        return "~"
+        return os.environ.get("HOME", "~")
     
     return None
 
 def _get_for_windows(which):
     if which == _ConfigScope.GLOBAL:
-        if "AppDataFolder" in os.environ:
-            return os.environ["AppDataFolder"]
+        return os.environ.get("AppDataFolder")
     elif which == _ConfigScope.USER:
-        if "LocalAppDataFolder" in os.environ:
-            return os.environ["LocalAppDataFolder"]
-        
-        return "~"
+        return os.environ.get("LocalAppDataFolder", "~")
 
     return None
 
@@ -84,11 +83,12 @@ def _add(locations, callback, scope):
     else:
         next = callback(scope)
         if next:
-            next = f"{next}/.xmcyber/xmapi.ini"
+            next = os.path.expanduser(os.path.join(next, ".xmcyber", "xmapi.ini"))
 
     if next:
         locations[scope] = next
 
+@functools.lru_cache(maxsize=1)
 def _get_locations():
     sys = platform.system()
     if sys in paths:
@@ -103,10 +103,11 @@ def _get_locations():
     _add(locations, _get_var, _ConfigScope.USER)
     _add(locations, _get_var, _ConfigScope.PROJECT)
 
-    return locations
+    # Returned as a tuple so the cached value can't be modified by callers
+    return tuple(locations.items())
 
 def parse_config():
-    locations = _get_locations()
+    locations = OrderedDict(_get_locations())
 
     _log.info(f"Looking for configuration files in {len(locations)}(s)")
     if len(locations) > 0 and _log.isEnabledFor(logging.DEBUG):
@@ -114,8 +115,17 @@ def parse_config():
         for location in locations:
             _log.debug(f"  {location.name} ({locations[location]})")
 
-    config = configparser.ConfigParser()
-    files = config.read(locations.values())
+    fingerprint = _get_fingerprint(locations.values())
+    cached = _load_cache(fingerprint)
+    if cached:
+        files, config = cached
+        _log.info("Using cached configuration")
+    else:
+        config = configparser.ConfigParser()
+        files = config.read(locations.values())
+        if files:
+            _save_cache(fingerprint, files, config)
+
     _log.info(f"Found a total of {len(files)} configuration file(s)")
     if len(files) == 0:
         return None
@@ -125,4 +135,56 @@ def parse_config():
         for file in files:
             _log.debug(f"  {file}")
 
-    return config
\ No newline at end of file
+    return config
+
+def _get_cache_path():
+    return os.path.join(os.path.expanduser("~"), ".xmcyber", _cache_name)
+
+def _get_fingerprint(locations):
+    fingerprint = []
+    for location in locations:
+        location = os.path.abspath(location)
+        try:
+            stat = os.stat(location)
+            fingerprint.append((location, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            fingerprint.append((location, None, None))
+
+    return tuple(fingerprint)
+
+def _load_cache(fingerprint):
+    cache_path = _get_cache_path()
+    try:
+        with open(cache_path, "rb") as f:
+            # Never unpickle a file that someone else could have written
+            stat = os.fstat(f.fileno())
+            if hasattr(os, "getuid") and (stat.st_uid != os.getuid() or stat.st_mode & 0o022):
+                _log.warning(f"Ignoring configuration cache {cache_path}; it is writable by other users")
+                return None
+
+            cached_fingerprint, files, config = pickle.load(f)
+    except Exception:
+        # Any unreadable or malformed cache is simply a cache miss
+        return None
+
+    if cached_fingerprint != fingerprint:
+        _log.debug("Configuration cache is stale; configuration files will be reparsed")
+        return None
+
+    return files, config
+
+def _save_cache(fingerprint, files, config):
+    cache_path = _get_cache_path()
+    temp_path = f"{cache_path}.{os.getpid()}"
+    try:
+        os.makedirs(os.path.dirname(cache_path), mode=0o700, exist_ok=True)
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((fingerprint, files, config), f)
+        os.replace(temp_path, cache_path)
+    except (OSError, pickle.PicklingError):
+        _log.debug(f"Unable to write configuration cache {cache_path}")
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
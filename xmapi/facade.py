@@ -1,36 +1,32 @@
 
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from xmapi.util import parse_json
 import xmapi.entityInventory
 import xmapi
 
+# Maximum number of pages fetched concurrently
+_MAX_WORKERS = 8
+
 _entityTypes = {}
 
 def get_entityTypes(refresh=False):
+    global _entityTypes
+    if _entityTypes and not refresh:
+        return _entityTypes
+
     r = xmapi.entityInventory.entityTypes()
     if r.status_code != 200:
         return None
-    
-    json = r.json()
-
-    global _entityTypes
-    if refresh or not _entityTypes:
-        types = {}
-        for type in json["data"]:
-            types[type["id"]] = type["displayName"]
-
-        _entityTypes = types
 
+    _entityTypes = {type["id"]: type["displayName"] for type in parse_json(r)["data"]}
     return _entityTypes
 
 
 
 def get_sensors(do_post = False, page=1, pageSize=100,search=None):
-    params={ 
-        'page':page,
-        'pageSize':pageSize,
-    }
-
-    if search:
-        params['search']= f'{{"$regex":"/{search}/i"}}'
+    params = _get_sensor_params(pageSize, search)
+    params['page'] = page
 
     if do_post:
         result = xmapi.api_post("sensors", params=params)
@@ -39,22 +35,68 @@ def get_sensors(do_post = False, page=1, pageSize=100,search=None):
 
     return result
 
-def get_all_sensors(searchTerm = None):
-    sensors = []
-    page = 1
-    pageSize = 100
+def get_all_sensors(searchTerm = None, page_size=500):
+    # The parameters only differ by page, so build them once for the whole loop
+    base_params = _get_sensor_params(page_size, searchTerm)
+
+    def get_page(page):
+        return xmapi.api_get("sensors", params=dict(base_params, page=page))
+
+    result = get_page(1)
+    if result.status_code < 200 or result.status_code > 299:
+        return None
+
+    json = parse_json(result)
+    sensors = list(json['data'])
+    paging = json['paging']
 
-    while True:
-        result = get_sensors(search=searchTerm, page=page, pageSize=pageSize)
+    if "totalPages" in paging:
+        # The remaining pages are known up front, so fetch them concurrently
+        executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS)
+        try:
+            for result in executor.map(get_page, range(2, paging['totalPages'] + 1)):
+                if result.status_code < 200 or result.status_code > 299:
+                    return None
+
+                sensors.extend(parse_json(result)['data'])
+        finally:
+            # Don't keep fetching the remaining pages once one of them has failed
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return sensors
+
+    while "nextLink" in paging:
+        # Follow the server's cursor rather than rebuilding the page parameters
+        result = xmapi.api_get(_get_link_path(paging['nextLink']))
         if result.status_code < 200 or result.status_code > 299:
             return None
 
-        json = result.json()
+        json = parse_json(result)
+        sensors.extend(json['data'])
+        paging = json['paging']
+
+    return sensors
+
+
+def _get_sensor_params(pageSize, search):
+    params = {
+        'pageSize':pageSize,
+    }
+
+    if search:
+        params['search']= f'{{"$regex":"/{search}/i"}}'
+
+    return params
+
+
+def _get_link_path(link):
+    """Converts a paging link into a path suitable for xmapi.api_get()."""
+    parts = urlsplit(link)
+    path = parts.path.lstrip("/")
+    if path.startswith("api/"):
+        path = path[len("api/"):]
 
-        for sensor in json['data']:
-            sensors.append(sensor)
+    if parts.query:
+        path = f"{path}?{parts.query}"
 
-        if "nextLink" in json['paging']:
-            page += 1
-        else:
-            return sensors
\ No newline at end of file
+    return path
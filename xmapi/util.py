@@ -2,6 +2,11 @@
 import logging
 import xmapi
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 _log = logging.getLogger('xmcyber')
 
@@ -18,4 +23,12 @@ def default_on_error(error_response):
     if xmapi.get_config().fail_on_error:
         fail_on_error(error_response)
     else:
-        log_on_error(error_response)
\ No newline at end of file
+        log_on_error(error_response)
+
+
+def parse_json(response):
+    """Decodes a JSON response body, using orjson when it is installed."""
+    if orjson:
+        return orjson.loads(response.content)
+
+    return response.json()